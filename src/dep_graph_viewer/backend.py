@@ -0,0 +1,287 @@
+"""Package dependency lookups through python-apt or apt-cache."""
+import gi
+gi.require_version("Gio", "2.0")
+from gi.repository import Gio, GLib
+
+import os
+import re
+import pickle
+import atexit
+import threading
+
+CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+    "dep-graph-viewer"
+)
+GRAPH_CACHE_FILE = os.path.join(CACHE_DIR, "graph.pickle")
+GRAPH_STAMP_FILES = ("/var/lib/dpkg/status", "/var/cache/apt/pkgcache.bin")
+
+# apt-cache prints an OR group as "|Depends: a" lines ending with a plain
+# "Depends: z"; like python-apt's dep[0], only the first alternative is kept.
+_DEP_RE = re.compile(rb"^\s*(\|)?(?:Pre)?Depends:\s*<?([^\s<>]+)", re.MULTILINE)
+
+_apt_cache = None
+_apt_lock = threading.Lock()
+
+
+def _open_apt_cache():
+    """Open the python-apt cache once; None if python-apt is unavailable."""
+    global _apt_cache
+    if _apt_cache is None:
+        try:
+            import apt
+            _apt_cache = apt.Cache()
+        except:
+            _apt_cache = False
+    return _apt_cache or None
+
+
+def _apt_deps(cache, package):
+    """Get Depends/PreDepends of the candidate version from the apt cache.
+
+    Only the first alternative of each OR group is kept.
+    """
+    try:
+        candidate = cache[package].candidate
+    except KeyError:
+        return ()
+    if candidate is None:
+        return ()
+    return tuple(dep[0].name for dep in candidate.dependencies)
+
+
+def run_apt_cache(args, cancellable=None, timeout=10):
+    """Run apt-cache and return its stdout, or None if it failed.
+
+    apt-cache is killed when cancellable is cancelled or after timeout
+    seconds, so superseded or hung queries do not keep running. The
+    timeout runs on a private main context iterated here, so it fires
+    whether or not the application's main loop is running.
+    """
+    try:
+        proc = Gio.Subprocess.new(["apt-cache"] + args,
+                                  Gio.SubprocessFlags.STDOUT_PIPE
+                                  | Gio.SubprocessFlags.STDERR_SILENCE)
+    except GLib.Error:
+        return None
+    context = GLib.MainContext.new()
+    context.push_thread_default()
+    result = []
+    try:
+        proc.communicate_async(None, cancellable,
+                               lambda p, res: result.append(res))
+        watchdog = GLib.timeout_source_new_seconds(timeout)
+        watchdog.set_callback(lambda *_args: proc.force_exit() or GLib.SOURCE_REMOVE)
+        watchdog.attach(context)
+        while not result:
+            context.iteration(True)
+        watchdog.destroy()
+        try:
+            _ok, stdout, _stderr = proc.communicate_finish(result[0])
+        except GLib.Error:
+            proc.force_exit()
+            return None
+    finally:
+        context.pop_thread_default()
+    if proc.get_if_signaled() or stdout is None:
+        return None
+    return stdout.get_data()
+
+
+# Successful lookups only; a failed or cancelled one raises OSError and
+# is retried next time.
+_deps_memo = {}
+_rdeps_memo = {}
+
+
+def get_deps(package, cancellable=None):
+    """Get dependencies for a package using python-apt or apt-cache.
+
+    Raises OSError if apt-cache fails or is cancelled, so the failure is
+    not memoized.
+    """
+    deps = _deps_memo.get(package)
+    if deps is None:
+        deps = _deps_memo[package] = _lookup_deps(package, cancellable)
+    return deps
+
+
+def _lookup_deps(package, cancellable):
+    with _apt_lock:
+        cache = _open_apt_cache()
+        if cache is not None:
+            return _apt_deps(cache, package)
+    out = run_apt_cache(["depends", package], cancellable)
+    if out is None:
+        raise OSError("apt-cache depends %s failed" % package)
+    deps = []
+    in_group = False
+    for m in _DEP_RE.finditer(out):
+        if not in_group:
+            deps.append(m.group(2).decode("ascii"))
+        in_group = m.group(1) is not None
+    return tuple(deps)
+
+
+def get_rdeps(package, cancellable=None):
+    """Get reverse dependencies; raises OSError if apt-cache fails."""
+    rdeps = _rdeps_memo.get(package)
+    if rdeps is None:
+        rdeps = _rdeps_memo[package] = _lookup_rdeps(package, cancellable)
+    return rdeps
+
+
+def _lookup_rdeps(package, cancellable):
+    with _apt_lock:
+        cache = _open_apt_cache()
+        if cache is not None:
+            # apt.Cache only wraps packages that have versions; the
+            # underlying apt_pkg.Cache also resolves virtual packages,
+            # and apt.Package exposes no reverse-dependency list.
+            try:
+                rev = cache._cache[package].rev_depends_list
+            except KeyError:
+                return ()
+            return tuple(dict.fromkeys(dep.parent_pkg.name for dep in rev))
+    out = run_apt_cache(["rdepends", package], cancellable)
+    if out is None:
+        raise OSError("apt-cache rdepends %s failed" % package)
+    rdeps = []
+    for line in out.decode(errors="replace").splitlines()[2:]:
+        line = line.strip()
+        if line and not line.startswith("|"):
+            rdeps.append(line)
+    # apt-cache lists a package once per dependency on it.
+    return tuple(dict.fromkeys(rdeps))
+
+
+_GRAPH_LINE_RE = re.compile(
+    r"^([^ ][^\n]*)$|^\s*(\|)?(?:Depends|PreDepends):\s*<?([^\s<>]+)>?")
+
+
+def fetch_dep_graph(root, cancellable=None):
+    """Get the transitive dependency graph of root as an adjacency dict."""
+    graph = {}
+    with _apt_lock:
+        cache = _open_apt_cache()
+        if cache is not None:
+            todo = [root]
+            while todo:
+                package = todo.pop()
+                if package not in graph:
+                    graph[package] = list(_apt_deps(cache, package))
+                    todo.extend(graph[package])
+            return graph
+    out = run_apt_cache(["depends", "--recurse",
+                          "--no-recommends", "--no-suggests",
+                          "--no-conflicts", "--no-breaks",
+                          "--no-replaces", "--no-enhances", root],
+                         cancellable, timeout=30)
+    if out is None:
+        return graph
+    current = None
+    in_group = False
+    for line in out.decode(errors="replace").splitlines():
+        m = _GRAPH_LINE_RE.match(line)
+        if m is None:
+            continue
+        if m.group(1):
+            current = graph.setdefault(m.group(1).strip("<>"), [])
+            in_group = False
+        elif current is not None:
+            if not in_group:
+                current.append(m.group(3))
+            in_group = m.group(2) is not None
+    return graph
+
+
+_graph_store = None
+_graph_stamp = None
+_graph_dirty = False
+_graph_lock = threading.Lock()
+
+
+def _apt_stamp():
+    """Modification times of the files whose change invalidates the graph."""
+    stamp = []
+    for path in GRAPH_STAMP_FILES:
+        try:
+            stamp.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            stamp.append(0)
+    return tuple(stamp)
+
+
+def _open_graph_store():
+    """Load the persisted dependency graph once; call with _graph_lock held."""
+    global _graph_store, _graph_stamp
+    if _graph_store is None:
+        _graph_stamp = _apt_stamp()
+        _graph_store = {}
+        try:
+            with open(GRAPH_CACHE_FILE, "rb") as f:
+                stamp, graph = pickle.load(f)
+            if stamp == _graph_stamp:
+                _graph_store = graph
+        except:
+            pass
+        atexit.register(_save_graph_store)
+    return _graph_store
+
+
+def _save_graph_store():
+    # Runs at exit while daemon workers may still be merging into the store.
+    tmp = GRAPH_CACHE_FILE + ".tmp"
+    with _graph_lock:
+        if not _graph_dirty:
+            return
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(tmp, "wb") as f:
+                pickle.dump((_graph_stamp, _graph_store), f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, GRAPH_CACHE_FILE)
+        except Exception:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+
+
+def get_dep_graph(root, cancellable=None):
+    """Get the transitive dependency graph of root, from disk if possible."""
+    with _graph_lock:
+        store = _open_graph_store()
+        graph = {}
+        todo = [root]
+        while todo:
+            package = todo.pop()
+            if package in graph:
+                continue
+            if package not in store:
+                break
+            graph[package] = store[package]
+            todo.extend(store[package])
+        else:
+            return graph
+    graph = fetch_dep_graph(root, cancellable)
+    if cancellable is not None and cancellable.is_cancelled():
+        return {}
+    store_deps(graph)
+    return graph
+
+
+def stored_deps(packages):
+    """Get the deps of those packages that are already in the graph store."""
+    with _graph_lock:
+        store = _open_graph_store()
+        return {package: store[package] for package in packages if package in store}
+
+
+def store_deps(graph):
+    """Merge freshly fetched adjacency lists into the graph store."""
+    global _graph_dirty
+    if not graph:
+        return
+    with _graph_lock:
+        _open_graph_store().update(graph)
+        _graph_dirty = True
@@ -0,0 +1,87 @@
+"""Cycle detection over dependency graphs (dicts of package -> deps)."""
+import collections
+
+
+def find_sccs(graph):
+    """Get the strongly connected components of graph (iterative Tarjan)."""
+    index = {}
+    lowlink = {}
+    on_stack = set()
+    stack = []
+    sccs = []
+    for root in graph:
+        if root in index:
+            continue
+        index[root] = lowlink[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(graph.get(root, ())))]
+        while work:
+            node, it = work[-1]
+            for dep in it:
+                if dep not in index:
+                    index[dep] = lowlink[dep] = len(index)
+                    stack.append(dep)
+                    on_stack.add(dep)
+                    work.append((dep, iter(graph.get(dep, ()))))
+                    break
+                if dep in on_stack:
+                    lowlink[node] = min(lowlink[node], index[dep])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    scc = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        scc.append(member)
+                        if member == node:
+                            break
+                    sccs.append(scc)
+    return sccs
+
+
+def shortest_cycle(graph, scc):
+    """Get the shortest cycle through the smallest package of an SCC."""
+    start = min(scc)
+    members = set(scc)
+    parent = {start: None}
+    todo = collections.deque([start])
+    while todo:
+        node = todo.popleft()
+        for dep in graph.get(node, ()):
+            if dep == start:
+                cycle = [node]
+                while cycle[-1] != start:
+                    cycle.append(parent[cycle[-1]])
+                cycle.reverse()
+                return cycle + [start]
+            if dep in members and dep not in parent:
+                parent[dep] = node
+                todo.append(dep)
+    return None
+
+
+def find_circular(graph):
+    """Detect circular dependencies in graph.
+
+    Every strongly connected component with more than one package, or
+    with a self-loop, contains a cycle; one representative cycle is
+    reported per component.
+    """
+    circles = []
+    for scc in find_sccs(graph):
+        if len(scc) == 1:
+            # Most components are single packages; only a self-loop
+            # makes one circular, so skip the BFS for them.
+            package = scc[0]
+            if package in graph.get(package, ()):
+                circles.append([package, package])
+            continue
+        cycle = shortest_cycle(graph, scc)
+        if cycle is not None:
+            circles.append(cycle)
+    return sorted(circles)
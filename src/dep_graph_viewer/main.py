@@ -2,25 +2,26 @@
 import gi
 gi.require_version("Gtk", "4.0")
 gi.require_version("Adw", "1")
-from gi.repository import Gtk, Adw, Gdk, Gio, GLib, Pango
+from gi.repository import Gtk, Adw, Gdk, Gio, GLib, GObject
 
 import gettext
 import locale
 import os
 import sys
 import json
-import datetime
+import copy
 import threading
-import subprocess
-import re
+import itertools
+import queue
+import traceback
+from concurrent.futures import ThreadPoolExecutor, CancelledError
 from dep_graph_viewer.accessibility import AccessibilityManager
+from dep_graph_viewer.backend import get_deps, get_rdeps, get_dep_graph, stored_deps, store_deps
+from dep_graph_viewer.graph import find_circular
 
 LOCALE_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "po")
 if not os.path.isdir(LOCALE_DIR):
     LOCALE_DIR = "/usr/share/locale"
-locale.bindtextdomain("dep-graph-viewer", LOCALE_DIR)
-gettext.bindtextdomain("dep-graph-viewer", LOCALE_DIR)
-gettext.textdomain("dep-graph-viewer")
 _ = gettext.gettext
 
 APP_ID = "se.danielnylander.dep.graph.viewer"
@@ -31,75 +32,55 @@ SETTINGS_DIR = os.path.join(
 SETTINGS_FILE = os.path.join(SETTINGS_DIR, "settings.json")
 
 
+_settings_snapshot = None
+
+
 def _load_settings():
+    global _settings_snapshot
     if os.path.exists(SETTINGS_FILE):
         with open(SETTINGS_FILE) as f:
-            return json.load(f)
-    return {"welcome_shown": False}
+            s = json.load(f)
+    else:
+        s = {"welcome_shown": False}
+    _settings_snapshot = copy.deepcopy(s)
+    return s
 
 
 def _save_settings(s):
+    """Write settings atomically, skipping the write if nothing changed."""
+    global _settings_snapshot
+    if s == _settings_snapshot:
+        return
     os.makedirs(SETTINGS_DIR, exist_ok=True)
-    with open(SETTINGS_FILE, "w") as f:
-        json.dump(s, f, indent=2)
-
-
-
-def _get_deps(package):
-    """Get dependencies for a package using dpkg/apt-cache."""
-    deps = []
+    tmp = SETTINGS_FILE + ".tmp"
     try:
-        r = subprocess.run(["apt-cache", "depends", package],
-                          capture_output=True, text=True, timeout=10)
-        for line in r.stdout.splitlines():
-            line = line.strip()
-            if line.startswith("Depends:") or line.startswith("PreDepends:"):
-                dep = line.split(":", 1)[1].strip().split()[0]
-                if dep.startswith("<"):
-                    dep = dep.strip("<>")
-                deps.append(dep)
-    except:
-        pass
-    return deps
+        with open(tmp, "w") as f:
+            json.dump(s, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, SETTINGS_FILE)
+    except Exception:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    _settings_snapshot = copy.deepcopy(s)
 
+_POOL = ThreadPoolExecutor(max_workers=8)
 
-def _get_rdeps(package):
-    """Get reverse dependencies."""
-    rdeps = []
-    try:
-        r = subprocess.run(["apt-cache", "rdepends", package],
-                          capture_output=True, text=True, timeout=10)
-        for line in r.stdout.splitlines()[2:]:
-            line = line.strip()
-            if line and not line.startswith("|"):
-                rdeps.append(line)
-    except:
-        pass
-    return rdeps
+_UI_BATCH = 16
+_ROW_CHUNK = 64
 
 
-def _find_circular(package, visited=None, path=None):
-    """Detect circular dependencies."""
-    if visited is None:
-        visited = set()
-    if path is None:
-        path = []
-    
-    if package in path:
-        return [path[path.index(package):] + [package]]
-    
-    if package in visited:
-        return []
-    
-    visited.add(package)
-    path.append(package)
-    circles = []
-    
-    for dep in _get_deps(package)[:10]:  # limit depth
-        circles.extend(_find_circular(dep, visited, path[:]))
-    
-    return circles
+class DepItem(GObject.Object):
+    """A package row in the dependency list."""
+    name = GObject.Property(type=str, default="")
+    count = GObject.Property(type=int, default=0)
+    error = GObject.Property(type=bool, default=False)
 
+    def __init__(self, name, count=0, error=False):
+        super().__init__(name=name, count=count, error=error)
 
 
 class DepGraphViewerWindow(Adw.ApplicationWindow):
@@ -107,6 +88,13 @@ class DepGraphViewerWindow(Adw.ApplicationWindow):
         super().__init__(application=app, title=_("Dep Graph Viewer"), default_width=1100, default_height=750)
         self.settings = _load_settings()
         self._dep_tree = {}
+        self._ui_queue = queue.Queue()
+        self._ui_lock = threading.Lock()
+        self._ui_scheduled = False
+        self._search_gen = 0
+        self._cancellable = Gio.Cancellable()
+        self._pending = iter(())
+        self._pending_status = ""
 
         main_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
 
@@ -147,11 +135,31 @@ class DepGraphViewerWindow(Adw.ApplicationWindow):
         main_box.append(headerbar)
 
         
+        self._filter_entry = Gtk.SearchEntry(placeholder_text=_("Filter packages..."))
+        self._filter_entry.set_margin_start(12)
+        self._filter_entry.set_margin_end(12)
+        self._filter_entry.set_margin_top(8)
+        self._filter_entry.connect("search-changed", self._on_filter_changed)
+        main_box.append(self._filter_entry)
+
         # Tree view
         scroll = Gtk.ScrolledWindow(vexpand=True)
-        self._tree_list = Gtk.ListBox()
-        self._tree_list.set_selection_mode(Gtk.SelectionMode.NONE)
-        self._tree_list.add_css_class("boxed-list")
+        self._store = Gio.ListStore.new(DepItem)
+        self._filter = Gtk.StringFilter.new(Gtk.PropertyExpression.new(DepItem, None, "name"))
+        filtered = Gtk.FilterListModel(model=self._store, filter=self._filter)
+        self._tree_list = Gtk.ColumnView(model=Gtk.NoSelection(model=filtered))
+        self._tree_list.add_css_class("data-table")
+        for title, bind, expand in [
+            (_("Name"), self._on_name_bind, True),
+            (_("Subdeps"), self._on_count_bind, False),
+        ]:
+            factory = Gtk.SignalListItemFactory()
+            factory.connect("setup", self._on_cell_setup)
+            factory.connect("bind", bind)
+            factory.connect("unbind", self._on_cell_unbind)
+            column = Gtk.ColumnViewColumn(title=title, factory=factory)
+            column.set_expand(expand)
+            self._tree_list.append_column(column)
         self._tree_list.set_margin_start(12)
         self._tree_list.set_margin_end(12)
         self._tree_list.set_margin_top(8)
@@ -184,6 +192,31 @@ class DepGraphViewerWindow(Adw.ApplicationWindow):
         if not self.settings.get("welcome_shown"):
             GLib.idle_add(self._show_welcome)
 
+    def _post(self, func, *args):
+        """Queue func(*args) to run on the main loop; safe from any thread."""
+        self._ui_queue.put((func, args))
+        with self._ui_lock:
+            if self._ui_scheduled:
+                return
+            self._ui_scheduled = True
+        GLib.idle_add(self._drain_ui_queue)
+
+    def _drain_ui_queue(self):
+        for _i in range(_UI_BATCH):
+            try:
+                func, args = self._ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                func(*args)
+            except Exception:
+                traceback.print_exc()
+        with self._ui_lock:
+            if not self._ui_queue.empty():
+                return GLib.SOURCE_CONTINUE
+            self._ui_scheduled = False
+        return GLib.SOURCE_REMOVE
+
     def _show_welcome(self):
         dialog = Adw.Dialog()
         dialog.set_title(_("Welcome"))
@@ -222,83 +255,135 @@ class DepGraphViewerWindow(Adw.ApplicationWindow):
         dialog.close()
 
     
+    def _on_cell_setup(self, factory, list_item):
+        list_item.set_child(Gtk.Label(xalign=0))
+
+    def _on_name_bind(self, factory, list_item):
+        label = list_item.get_child()
+        item = list_item.get_item()
+        label.set_text(item.name)
+        if item.error:
+            label.add_css_class("error")
+
+    def _on_count_bind(self, factory, list_item):
+        item = list_item.get_item()
+        list_item.get_child().set_text(str(item.count) if item.count else "")
+
+    def _on_cell_unbind(self, factory, list_item):
+        label = list_item.get_child()
+        label.set_text("")
+        label.remove_css_class("error")
+
+    def _on_filter_changed(self, entry):
+        self._filter.set_search(entry.get_text())
+
+    def _begin_search(self):
+        """Supersede the running search; returns the new generation and cancellable."""
+        self._search_gen += 1
+        self._cancellable.cancel()
+        self._cancellable = Gio.Cancellable()
+        return self._search_gen, self._cancellable
+
     def _on_search(self, *_args):
         pkg = self._pkg_entry.get_text().strip()
         if not pkg:
             return
         self._status.set_text(_("Loading dependencies for %s...") % pkg)
-        threading.Thread(target=self._load_deps, args=(pkg,), daemon=True).start()
+        threading.Thread(target=self._load_deps, args=(pkg, *self._begin_search()), daemon=True).start()
 
-    def _load_deps(self, pkg):
-        deps = _get_deps(pkg)
-        GLib.idle_add(self._show_deps, pkg, deps, _("Dependencies of %s") % pkg)
+    def _load_deps(self, pkg, gen, cancellable):
+        graph = get_dep_graph(pkg, cancellable)
+        if gen != self._search_gen:
+            return
+        deps = graph.get(pkg, [])
+        self._post(self._show_deps, gen, pkg, deps, _("Dependencies of %s") % pkg, graph)
 
-    def _show_deps(self, pkg, deps, title):
-        while True:
-            row = self._tree_list.get_row_at_index(0)
-            if row is None:
-                break
-            self._tree_list.remove(row)
-        
-        header = Adw.ActionRow()
-        header.set_title(title)
-        header.set_subtitle(_("%(count)d packages") % {"count": len(deps)})
-        self._tree_list.append(header)
-        
-        for dep in deps:
-            row = Adw.ActionRow()
-            row.set_title(dep)
-            subdeps = _get_deps(dep)
-            if subdeps:
-                row.set_subtitle(_("%(count)d dependencies") % {"count": len(subdeps)})
-            self._tree_list.append(row)
-        
+    def _show_deps(self, gen, pkg, deps, title, graph):
+        if gen != self._search_gen:
+            return
+        items = (DepItem(dep, len(graph.get(dep, ()))) for dep in deps)
+        self._title_widget.set_subtitle(title)
+        self._populate(items, _("%(pkg)s: %(count)d dependencies") % {"pkg": pkg, "count": len(deps)})
+
+    def _populate(self, items, status):
+        """Replace the list contents, streaming items in chunks."""
+        self._store.remove_all()
+        self._pending = iter(items)
+        self._pending_status = status
         self._stack.set_visible_child_name("tree")
-        self._status.set_text(_("%(pkg)s: %(count)d dependencies") % {"pkg": pkg, "count": len(deps)})
+        GLib.idle_add(self._drain_rows, self._search_gen)
+
+    def _drain_rows(self, gen):
+        if gen != self._search_gen:
+            return GLib.SOURCE_REMOVE
+        chunk = list(itertools.islice(self._pending, _ROW_CHUNK))
+        self._store.splice(self._store.get_n_items(), 0, chunk)
+        if len(chunk) == _ROW_CHUNK:
+            self._status.set_text(_("Loading… %(count)d packages") % {"count": self._store.get_n_items()})
+            return GLib.SOURCE_CONTINUE
+        self._status.set_text(self._pending_status)
+        return GLib.SOURCE_REMOVE
 
     def _on_rdeps(self, btn):
         pkg = self._pkg_entry.get_text().strip()
         if not pkg:
             return
         self._status.set_text(_("Loading reverse dependencies..."))
-        threading.Thread(target=self._load_rdeps, args=(pkg,), daemon=True).start()
+        threading.Thread(target=self._load_rdeps, args=(pkg, *self._begin_search()), daemon=True).start()
 
-    def _load_rdeps(self, pkg):
-        rdeps = _get_rdeps(pkg)
-        GLib.idle_add(self._show_deps, pkg, rdeps, _("Reverse dependencies of %s") % pkg)
+    def _load_rdeps(self, pkg, gen, cancellable):
+        def fetch(rdep):
+            if gen != self._search_gen:
+                return None
+            try:
+                return get_deps(rdep, cancellable)
+            except OSError:
+                return None
+
+        try:
+            rdeps = get_rdeps(pkg, cancellable)
+        except OSError:
+            rdeps = ()
+        if gen != self._search_gen:
+            return
+        graph = stored_deps(rdeps)
+        cold = [rdep for rdep in rdeps if rdep not in graph]
+        try:
+            fetched = dict(zip(cold, _POOL.map(fetch, cold)))
+        except (CancelledError, RuntimeError):
+            # The pool was shut down on quit.
+            return
+        if gen != self._search_gen:
+            return
+        # Failed lookups are shown without a count but never stored.
+        fetched = {rdep: deps for rdep, deps in fetched.items() if deps is not None}
+        store_deps(fetched)
+        graph.update(fetched)
+        self._post(self._show_deps, gen, pkg, rdeps, _("Reverse dependencies of %s") % pkg, graph)
 
     def _on_circular(self, btn):
         pkg = self._pkg_entry.get_text().strip()
         if not pkg:
             return
         self._status.set_text(_("Checking for circular dependencies..."))
-        threading.Thread(target=self._check_circular, args=(pkg,), daemon=True).start()
+        threading.Thread(target=self._check_circular, args=(pkg, *self._begin_search()), daemon=True).start()
 
-    def _check_circular(self, pkg):
-        circles = _find_circular(pkg)
-        GLib.idle_add(self._show_circular, pkg, circles)
+    def _check_circular(self, pkg, gen, cancellable):
+        graph = get_dep_graph(pkg, cancellable)
+        if gen != self._search_gen:
+            return
+        circles = find_circular(graph)
+        self._post(self._show_circular, gen, pkg, circles)
 
-    def _show_circular(self, pkg, circles):
-        while True:
-            row = self._tree_list.get_row_at_index(0)
-            if row is None:
-                break
-            self._tree_list.remove(row)
-        
+    def _show_circular(self, gen, pkg, circles):
+        if gen != self._search_gen:
+            return
         if not circles:
-            row = Adw.ActionRow()
-            row.set_title(_("No circular dependencies found"))
-            row.set_subtitle(pkg)
-            self._tree_list.append(row)
+            items = [DepItem(_("No circular dependencies found"))]
         else:
-            for circle in circles[:20]:
-                row = Adw.ActionRow()
-                row.set_title(" → ".join(circle))
-                row.add_css_class("error")
-                self._tree_list.append(row)
-        
-        self._stack.set_visible_child_name("tree")
-        self._status.set_text(_("%(count)d circular dependencies found") % {"count": len(circles)})
+            items = [DepItem(" → ".join(circle), error=True) for circle in circles[:20]]
+        self._title_widget.set_subtitle(_("Circular dependencies of %s") % pkg)
+        self._populate(items, _("%(count)d circular dependencies found") % {"count": len(circles)})
 
 
 class DepGraphViewerApp(Adw.Application):
@@ -320,11 +405,26 @@ class DepGraphViewerApp(Adw.Application):
         self.set_accels_for_action("app.quit", ["<Ctrl>q"])
         self.set_accels_for_action("app.shortcuts", ["<Ctrl>slash"])
 
+    def do_startup(self):
+        Adw.Application.do_startup(self)
+        locale.bindtextdomain("dep-graph-viewer", LOCALE_DIR)
+        gettext.bindtextdomain("dep-graph-viewer", LOCALE_DIR)
+        gettext.textdomain("dep-graph-viewer")
+
     def do_activate(self):
         if not self.window:
             self.window = DepGraphViewerWindow(self)
         self.window.present()
 
+    def do_shutdown(self):
+        # Bumping the generation makes running lookups bail out and kills
+        # their apt-cache children; queued ones are dropped so exit does
+        # not wait for the whole fan-out.
+        if self.window:
+            self.window._begin_search()
+        _POOL.shutdown(wait=False, cancel_futures=True)
+        Adw.Application.do_shutdown(self)
+
     def _on_settings(self, *_args):
         if not self.window:
             return
@@ -434,11 +534,11 @@ def _setup_fullscreen(window, app):
 
 
 # --- Plugin system ---
-import importlib.util
 import os as _pos
 
 def _load_plugins(app_name):
     """Load plugins from ~/.config/<app>/plugins/."""
+    import importlib.util
     plugin_dir = _pos.path.join(_pos.path.expanduser('~'), '.config', app_name, 'plugins')
     plugins = []
     if not _pos.path.isdir(plugin_dir):
@@ -0,0 +1,125 @@
+"""Tests for apt-cache output parsing in dep_graph_viewer.backend."""
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("gi")
+from dep_graph_viewer import backend
+
+RECURSE_OUTPUT = b"""\
+bash
+  PreDepends: libc6
+  Depends: base-files
+  Conflicts: <bash-completion>
+  Recommends: bash-completion
+libc6
+  Depends: libgcc-s1
+base-files
+  PreDepends: <awk>
+    mawk
+python3.11
+  Depends: python3.11-minimal
+ |Depends: media-types
+  Depends: <mime-support>
+  Depends: libexpat1
+libgcc-s1
+  Depends: libc6
+<awk>
+"""
+
+
+@pytest.fixture
+def apt_cache(monkeypatch):
+    """Stub run_apt_cache and disable python-apt; returns the call log."""
+    calls = []
+    outputs = {}
+
+    def run(args, cancellable=None, timeout=10):
+        calls.append(args)
+        return outputs.get(args[0])
+
+    monkeypatch.setattr(backend, "_apt_cache", False)
+    monkeypatch.setattr(backend, "run_apt_cache", run)
+    monkeypatch.setattr(backend, "_deps_memo", {})
+    monkeypatch.setattr(backend, "_rdeps_memo", {})
+    return outputs, calls
+
+
+def test_fetch_dep_graph_parses_recurse_output(apt_cache):
+    outputs, calls = apt_cache
+    outputs["depends"] = RECURSE_OUTPUT
+    graph = backend.fetch_dep_graph("bash")
+    assert calls[0][0] == "depends" and "--recurse" in calls[0]
+    assert graph == {
+        "bash": ["libc6", "base-files"],
+        "libc6": ["libgcc-s1"],
+        "base-files": ["awk"],
+        "python3.11": ["python3.11-minimal", "media-types", "libexpat1"],
+        "libgcc-s1": ["libc6"],
+        "awk": [],
+    }
+
+
+def test_fetch_dep_graph_failure_is_empty(apt_cache):
+    assert backend.fetch_dep_graph("bash") == {}
+
+
+def test_get_deps_keeps_first_or_alternative(apt_cache):
+    outputs, _calls = apt_cache
+    outputs["depends"] = RECURSE_OUTPUT.split(b"python3.11\n")[1].split(b"libgcc")[0]
+    assert backend.get_deps("python3.11") == (
+        "python3.11-minimal", "media-types", "libexpat1")
+
+
+def test_get_deps_failure_is_not_memoized(apt_cache):
+    outputs, calls = apt_cache
+    with pytest.raises(OSError):
+        backend.get_deps("bash")
+    outputs["depends"] = b"bash\n  Depends: libc6\n"
+    assert backend.get_deps("bash") == ("libc6",)
+    assert backend.get_deps("bash") == ("libc6",)
+    assert len(calls) == 2
+
+
+def test_run_apt_cache_timeout_without_main_loop(tmp_path, monkeypatch):
+    stub = tmp_path / "apt-cache"
+    stub.write_text("#!/bin/sh\nexec sleep 30\n")
+    stub.chmod(0o755)
+    monkeypatch.setenv("PATH", "%s:%s" % (tmp_path, backend.os.environ["PATH"]))
+    start = time.monotonic()
+    assert backend.run_apt_cache(["depends", "bash"], timeout=1) is None
+    assert time.monotonic() - start < 10
+
+
+def test_run_apt_cache_cancelled(tmp_path, monkeypatch):
+    stub = tmp_path / "apt-cache"
+    stub.write_text("#!/bin/sh\nexec sleep 30\n")
+    stub.chmod(0o755)
+    monkeypatch.setenv("PATH", "%s:%s" % (tmp_path, backend.os.environ["PATH"]))
+    cancellable = backend.Gio.Cancellable()
+    threading.Timer(0.2, cancellable.cancel).start()
+    start = time.monotonic()
+    assert backend.run_apt_cache(["depends", "bash"], cancellable) is None
+    assert time.monotonic() - start < 5
+
+
+def test_get_rdeps_passes_cancellable(apt_cache, monkeypatch):
+    seen = []
+    cancellable = backend.Gio.Cancellable()
+
+    def run(args, cancellable=None, timeout=10):
+        seen.append(cancellable)
+        return None
+
+    monkeypatch.setattr(backend, "run_apt_cache", run)
+    with pytest.raises(OSError):
+        backend.get_rdeps("bash", cancellable)
+    assert seen == [cancellable]
+
+
+def test_get_rdeps_drops_duplicates(apt_cache):
+    outputs, _calls = apt_cache
+    outputs["rdepends"] = (b"python3-yaml\nReverse Depends:\n"
+                           b"  python3\n |python3-full\n  python3\n  python3-full\n")
+    assert backend.get_rdeps("python3-yaml") == ("python3", "python3-full")
@@ -0,0 +1,81 @@
+"""Tests for cycle detection in dep_graph_viewer.graph."""
+import itertools
+import random
+
+from dep_graph_viewer.graph import find_circular, find_sccs, shortest_cycle
+
+
+def _reachable(graph, start):
+    seen = set()
+    todo = [start]
+    while todo:
+        for dep in graph.get(todo.pop(), ()):
+            if dep not in seen:
+                seen.add(dep)
+                todo.append(dep)
+    return seen
+
+
+def test_dag_has_no_cycles():
+    graph = {"a": ["b", "c"], "b": ["c", "d"], "c": ["d"], "d": []}
+    assert find_circular(graph) == []
+    assert sorted(map(sorted, find_sccs(graph))) == [["a"], ["b"], ["c"], ["d"]]
+
+
+def test_self_loop():
+    graph = {"a": ["a", "b"], "b": []}
+    assert find_circular(graph) == [["a", "a"]]
+
+
+def test_singleton_without_self_loop_is_not_circular():
+    assert find_circular({"a": []}) == []
+
+
+def test_multi_node_scc():
+    graph = {"a": ["b"], "b": ["c"], "c": ["a", "d"], "d": []}
+    assert sorted(map(sorted, find_sccs(graph))) == [["a", "b", "c"], ["d"]]
+    assert find_circular(graph) == [["a", "b", "c", "a"]]
+
+
+def test_one_cycle_per_component_starting_at_smallest_package():
+    graph = {
+        "libc6": ["libgcc-s1"],
+        "libgcc-s1": ["gcc-12-base", "libc6"],
+        "gcc-12-base": [],
+        "x": ["y"],
+        "y": ["x", "z"],
+        "z": ["y"],
+    }
+    assert find_circular(graph) == [
+        ["libc6", "libgcc-s1", "libc6"],
+        ["x", "y", "x"],
+    ]
+
+
+def test_shortest_cycle_prefers_shortest_path_back():
+    graph = {"a": ["b", "c"], "b": ["c"], "c": ["a"]}
+    assert shortest_cycle(graph, ["a", "b", "c"]) == ["a", "c", "a"]
+
+
+def test_deps_missing_from_graph_are_leaves():
+    assert find_circular({"a": ["b"], "b": ["missing"]}) == []
+
+
+def test_sccs_match_mutual_reachability():
+    rng = random.Random(0)
+    for _ in range(300):
+        n = 9
+        graph = {
+            str(i): [str(rng.randrange(n + 2)) for _ in range(rng.randrange(4))]
+            for i in range(n)
+        }
+        nodes = set(graph) | set(itertools.chain.from_iterable(graph.values()))
+        reach = {node: _reachable(graph, node) for node in nodes}
+        expected = {
+            frozenset([a] + [b for b in nodes if b in reach[a] and a in reach[b]])
+            for a in nodes
+        }
+        assert {frozenset(scc) for scc in find_sccs(graph)} == expected
+        for cycle in find_circular(graph):
+            assert cycle[0] == cycle[-1]
+            assert all(b in graph[a] for a, b in zip(cycle, cycle[1:]))